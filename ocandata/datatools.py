@@ -1,17 +1,77 @@
-import requests, zipfile, io
+import requests, zipfile
 import os
 import hashlib
+import tempfile
+
+_CHUNK_SIZE = 1 << 20
+_EXTRACTED_SENTINEL = ".extracted"
 
 
 def hash(data: str):
     return hashlib.sha1(data.encode()).hexdigest()
 
 
-def unzip_data(zip_url: str, path="."):
-    response = requests.get(zip_url)
-    zip_file = zipfile.ZipFile(io.BytesIO(response.content))
-    zip_file.extractall(path=path)
-    return tuple([os.path.join(path, f) for f in zip_file.namelist()])
+def _read_extracted(zip_url: str, path):
+    """
+    Get the files previously extracted from zip_url to path, or None if the
+    extraction is missing or incomplete
+    """
+    sentinel = os.path.join(path, _EXTRACTED_SENTINEL)
+    if not os.path.exists(sentinel):
+        return None
+    try:
+        with open(sentinel) as fd:
+            key, *names = fd.read().splitlines()
+    except (OSError, UnicodeDecodeError, ValueError):
+        # An unreadable or empty sentinel is treated as a cache miss
+        return None
+    files = tuple([os.path.join(path, f) for f in names])
+    if key != hash(zip_url) or not files or not all(os.path.exists(f) for f in files):
+        return None
+    return files
+
+
+def unzip_data(zip_url: str, path=".", refresh: bool = False):
+    """
+    Download a zip file and extract it to a directory under path named by the
+    hash of zip_url, so zips with the same member names don't overwrite each
+    other. The download is streamed to a temporary file so the whole archive
+    is never held in memory.
+    Files already extracted from the same url are reused unless refresh is set
+    """
+    path = os.path.join(path, hash(zip_url))
+    if not refresh:
+        files = _read_extracted(zip_url, path)
+        if files:
+            return files
+    os.makedirs(path, exist_ok=True)
+    sentinel = os.path.join(path, _EXTRACTED_SENTINEL)
+    if os.path.exists(sentinel):
+        os.remove(sentinel)
+    with requests.get(zip_url, stream=True) as response, tempfile.TemporaryFile() as tmp:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+            tmp.write(chunk)
+        expected_size = response.headers.get("Content-Length")
+        if (
+            expected_size
+            and "Content-Encoding" not in response.headers
+            and tmp.tell() != int(expected_size)
+        ):
+            raise IOError(
+                f"Downloaded {tmp.tell()} of {expected_size} bytes from {zip_url}"
+            )
+        tmp.seek(0)
+        with zipfile.ZipFile(tmp) as zip_file:
+            zip_file.extractall(path=path)
+            names = zip_file.namelist()
+    # Only mark the extraction complete once every file is on disk. The
+    # sentinel is written to a temporary file and moved into place so it is
+    # never seen half written
+    with tempfile.NamedTemporaryFile("w", dir=path, delete=False) as fd:
+        fd.write("\n".join([hash(zip_url)] + names))
+    os.replace(fd.name, sentinel)
+    return tuple([os.path.join(path, f) for f in names])
 
 
 def get_filename_from_url(path: str):
@@ -1,10 +1,18 @@
 from pathlib import Path
 import re
+import threading
 from .datatools import unzip_data, hash
 from .config import DOTPATH
 
 _REPO_NAME = "repo"
 
+# One lock per extracted url so concurrent fetches of the same url don't
+# download and extract it twice. Each url extracts into its own directory, so
+# fetches of different urls, like the eng and fra zips of a cube, never write
+# to files another fetch is reading. setdefault is atomic so no other lock is
+# needed to guard it
+_EXTRACT_LOCKS = {}
+
 
 class Repo:
     def __init__(self, path):
@@ -34,12 +42,13 @@ class Repo:
         root = Path.home() / dotpath
         return cls(root)
 
-    def unzip(self, url, resource_id: str = None):
+    def unzip(self, url, resource_id: str = None, refresh: bool = False):
         if not resource_id:
             resource_id = hash(url)
         extract_dir = self.extracted / resource_id
         print("Extracting files to", extract_dir)
-        files = unzip_data(url, extract_dir)
+        with _EXTRACT_LOCKS.setdefault((str(extract_dir), url), threading.Lock()):
+            files = unzip_data(url, extract_dir, refresh=refresh)
         return files
 
     def __repr__(self):
@@ -1,3 +1,5 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 import os
@@ -5,6 +7,13 @@ import re
 from .repo import Repo
 import logging
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
 logger = logging.getLogger("ocandata")
 
 
@@ -35,43 +44,212 @@ STATSCAN_TYPES = {
     "SCALAR_ID": "category",
     "STATUS": "category",
     "SYMBOL": "category",
+    "DGUID": "category",
+    "COORDINATE": "category",
+    "VECTOR": "category",
+    "Element": "category",
 }
+STATSCAN_DATES = ["REF_DATE"]
+
+
+def _gb(data: pd.DataFrame, cols):
+    """
+    Group statscan data on the given columns. Only observed category
+    combinations are grouped, groups keep the order they appear in and rows
+    with missing keys are kept in their own group
+    """
+    return data.groupby(cols, observed=True, sort=False, dropna=False)
+
+
+def _read_csv_table(statcan_fn: str, string_cols, include_columns):
+    convert_options = pa_csv.ConvertOptions(
+        column_types={col: pa.string() for col in string_cols},
+        strings_can_be_null=True,
+        include_columns=include_columns,
+    )
+    return pa_csv.read_csv(statcan_fn, convert_options=convert_options)
+
+
+def _read_statscan_csv_arrow(statcan_fn: str, usecols=None):
+    """
+    Read a statscan csv file with Arrow, which parses it on multiple threads.
+    Arrow infers the column types before any pandas dtype is applied, so the
+    statscan columns are read as strings to keep codes like COORDINATE 1.10
+    intact, and converted afterwards the same way the C engine does
+    """
+    if usecols:
+        # Arrow returns the columns in the order they are asked for while the
+        # C engine keeps them in file order
+        header = pd.read_csv(statcan_fn, nrows=0).columns
+        missing = [col for col in usecols if col not in header]
+        if missing:
+            raise ValueError(
+                f"Usecols do not match columns, columns expected but not found: {missing}"
+            )
+        usecols = [col for col in header if col in usecols]
+    table = _read_csv_table(
+        statcan_fn, list(STATSCAN_TYPES) + STATSCAN_DATES, usecols or []
+    )
+    # Arrow also infers dates and times, which the C engine leaves as strings,
+    # so those columns are read again as strings
+    temporal_cols = [
+        field.name for field in table.schema if pa.types.is_temporal(field.type)
+    ]
+    if temporal_cols:
+        strings = _read_csv_table(statcan_fn, temporal_cols, temporal_cols)
+        for col in temporal_cols:
+            table = table.set_column(
+                table.schema.get_field_index(col), col, strings.column(col)
+            )
+    # Columns with no values have no type, the C engine reads them as floats
+    for position, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(
+                position, field.name, table.column(position).cast(pa.float64())
+            )
+    data = table.to_pandas()
+    for col in data.columns:
+        if col in STATSCAN_TYPES:
+            values = data[col]
+            if not values.notna().any():
+                # The C engine gives an empty column object categories
+                values = values.astype(object)
+            data[col] = values.astype(STATSCAN_TYPES[col])
+        elif col in STATSCAN_DATES:
+            try:
+                data[col] = pd.to_datetime(data[col])
+            except (ValueError, TypeError):
+                # Left as strings like parse_dates does when they aren't dates
+                pass
+    return data
+
+
+def read_statscan_csv(statcan_fn: str, usecols=None):
+    if pa is not None:
+        return _read_statscan_csv_arrow(statcan_fn, usecols=usecols)
+    return pd.read_csv(
+        statcan_fn,
+        dtype=STATSCAN_TYPES,
+        parse_dates=STATSCAN_DATES,
+        usecols=usecols,
+        low_memory=False,
+        memory_map=True,
+    )
+
+
+def _pivot_wider(statscan_data: pd.DataFrame, group_cols, pivot_column, pivot_values):
+    """
+    Pivot with Arrow's pivot_wider, which groups and spreads the pivot values
+    in a single hash pass
+    :return: the first row of each group in file order and the pivoted values
+    for each group, or None if Arrow can't pivot this data e.g. when it is
+    empty, a column can't be converted, there are missing pivot values or
+    more than one value per cell
+    """
+    if pivot_values.empty:
+        return None
+    options = pc.PivotWiderOptions(
+        key_names=[str(value) for value in pivot_values],
+        unexpected_key_behavior="raise",
+    )
+    try:
+        # Columns Arrow can't convert, like mixed object columns, are left to
+        # the groupby path
+        table = pa.Table.from_pandas(
+            statscan_data[group_cols + [pivot_column, "VALUE"]], preserve_index=False
+        )
+        table = table.set_column(
+            len(group_cols),
+            pivot_column,
+            table.column(pivot_column).cast(pa.string()),
+        )
+        # Keep the first row of each group so groups stay in file order
+        table = table.append_column("first_row", pa.array(np.arange(len(table))))
+        table = table.group_by(group_cols).aggregate(
+            [
+                ("first_row", "min"),
+                ((pivot_column, "VALUE"), "pivot_wider", options),
+            ]
+        )
+    except (
+        pa.ArrowInvalid,
+        pa.ArrowTypeError,
+        pa.ArrowKeyError,
+        pa.ArrowNotImplementedError,
+    ):
+        return None
+    table = table.take(pc.sort_indices(table.column("first_row_min")))
+    cells = table.column(table.num_columns - 1).combine_chunks()
+    values = np.column_stack(
+        [
+            cells.field(i).to_numpy(zero_copy_only=False)
+            for i in range(len(pivot_values))
+        ]
+    )
+    return table.column("first_row_min").to_numpy(), values
 
 
-def read_statscan_csv(statcan_fn: str):
-    return pd.read_csv(statcan_fn, dtype=STATSCAN_TYPES, low_memory=False)
+def _pivot_groupby(statscan_data: pd.DataFrame, group_cols, pivot_column, pivot_values):
+    """
+    Pivot by numbering the groups in the order they appear, then taking the max
+    value per group and pivot value
+    :return: the first row of each group in file order and the pivoted values
+    for each group
+    """
+    group_ids = _gb(statscan_data, group_cols).ngroup()
+    first_rows = np.flatnonzero(~group_ids.duplicated().to_numpy())
+    values = (
+        _gb(statscan_data["VALUE"], [group_ids, statscan_data[pivot_column]])
+        .max()
+        .unstack(pivot_column)
+        .reindex(columns=pivot_values)
+    )
+    return first_rows, values.to_numpy()
 
 
 def to_wide_format(statscan_data: pd.DataFrame, pivot_column):
     """
-    Converts statscan data to wide format
+    Converts statscan data to wide format. Rows are in the order the groups
+    first appear and the pivot values become columns in sorted order
     :param statscan_data:
     :return: a dataframe with the statscan data converted to wide format
     """
-    base = statscan_data.copy()
     group_cols = [
         col
-        for col in base.columns.tolist()
+        for col in statscan_data.columns.tolist()
         if col not in CONTROL_COLS + [pivot_column, "VALUE"]
     ]
-    # Assign a group number
-    base["group"] = base.groupby(group_cols).ngroup()
-
-    # Pivot on the group, turning the element into columns
-    values = base.pivot_table(
-        index="group",
-        columns=pivot_column,
-        values="VALUE",
-        aggfunc=np.max,
-        dropna=False,
+    pivot_values = pd.Index(statscan_data[pivot_column].unique()).sort_values()
+    pivoted = None
+    if (
+        pa is not None
+        and hasattr(pc, "PivotWiderOptions")
+        and pd.api.types.is_numeric_dtype(statscan_data["VALUE"])
+    ):
+        pivoted = _pivot_wider(statscan_data, group_cols, pivot_column, pivot_values)
+    if pivoted is None:
+        pivoted = _pivot_groupby(statscan_data, group_cols, pivot_column, pivot_values)
+    first_rows, values = pivoted
+
+    # Keep the values in one row-major block so row-wise numpy access on the
+    # wide frame doesn't need a copy, then put the other columns in front,
+    # taking the control columns from the first row of each group
+    wide = pd.DataFrame(
+        np.ascontiguousarray(values), columns=pivot_values.tolist(), copy=False
     )
-    # Drop Element and VALUE columns and drop duplicates
-    base = base.drop(columns=[pivot_column, "VALUE"]).drop_duplicates(subset=group_cols)
-    # Now merge with values
-    return base.merge(values, on="group").drop(columns="group")
+    keys = statscan_data.iloc[first_rows]
+    key_cols = [
+        col for col in statscan_data.columns if col not in [pivot_column, "VALUE"]
+    ]
+    for position, col in enumerate(key_cols):
+        wide.insert(position, col, keys[col].array)
+    return wide
 
 
-_STATSCAN_DATASET_RE = re.compile("(\d+)(\-(eng|fra))?\.(\w+)+")
+# Not anchored at the end since the filename can carry a query string
+_STATSCAN_DATASET_RE = re.compile(
+    r"(?P<resourceid>\d+)(?:-(?P<language>eng|fra))?\.(?P<extension>\w+)"
+)
 
 
 class StatscanUrl:
@@ -95,17 +273,18 @@ class StatscanUrl:
         self.metadata = metadata
 
     @classmethod
+    @functools.lru_cache(maxsize=256)
     def parse_from_filename(cls, url: str):
         filename = os.path.basename(url)
         baseurl = url[: url.index(filename)]
         match = _STATSCAN_DATASET_RE.match(filename)
         if match:
             file = match.group(0)
-            resourceid = match.group(1)
-            language = match.group(3)
-            extension = match.group(4)
-            data = f"{match.group(1)}.csv"
-            metadata = f"{match.group(1)}_MetaData.csv"
+            resourceid = match.group("resourceid")
+            language = match.group("language")
+            extension = match.group("extension")
+            data = f"{resourceid}.csv"
+            metadata = f"{resourceid}_MetaData.csv"
             return StatscanUrl(
                 baseurl=baseurl,
                 file=file,
@@ -125,15 +304,34 @@ class StatscanUrl:
         return f"StatscanUrl {self.__dict__}"
 
 
-statscan_zipurl_re = re.compile(r".*[0-9]+(\-(en|fr)\w+?)?\.zip.*?")
+statscan_zipurl_re = re.compile(r"[0-9](?:-(?:en|fr)\w*)?\.zip")
 
 
 class StatscanZip(object):
     def __init__(self, url: str, repo: Repo = None):
-        assert statscan_zipurl_re.fullmatch(url)
+        assert statscan_zipurl_re.search(url)
         self.url: str = url
         self.url_info: StatscanUrl = StatscanUrl.parse_from_filename(url)
         self.repo: Repo = repo or Repo.at_user_home()
+        self._data = {}
+        self._files = None
+
+    @classmethod
+    def fetch_many(cls, urls, max_workers: int = 8, repo: Repo = None, **kwargs):
+        """
+        Get the data from several zipfiles, fetching them on a pool of threads
+        :param urls: the urls of the zipfiles
+        :param max_workers: the number of zipfiles to fetch at the same time
+        :param repo: the repo to extract the zipfiles to
+        :param kwargs: the arguments to pass to get_data
+        :return: a list of Dataframes in the same order as the urls
+        """
+
+        def get_data(url):
+            return cls(url, repo=repo).get_data(**kwargs)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(get_data, urls))
 
     def dimensions(self):
         return self.get_metadata().dimensions
@@ -151,8 +349,13 @@ class StatscanZip(object):
                 data[col] = pd.to_datetime(data[col]).dt.normalize()
 
     def _fetch_data(self):
-        resource_id: str = self.url_info.resourceid
-        data_file, metadata_file = self.repo.unzip(self.url, resource_id=resource_id)
+        # The data and metadata both need the files so they are fetched once.
+        # Each url is extracted into its own directory so no other url can
+        # replace them, and they are fetched again if they have been removed
+        if self._files is None or not all(os.path.exists(f) for f in self._files):
+            resource_id: str = self.url_info.resourceid
+            self._files = self.repo.unzip(self.url, resource_id=resource_id)
+        data_file, metadata_file = self._files
         return data_file, metadata_file
 
     def transform_statscan_data(
@@ -164,38 +367,32 @@ class StatscanZip(object):
     ):
         primary_dimension = self.primary_dimension()
         units_of_measure = (
-            data[[primary_dimension, "UOM"]]
-            .drop_duplicates()
-            .set_index(primary_dimension)
-            .sort_index()
+            data.groupby(primary_dimension, observed=True)["UOM"].first().to_frame()
         )
         setattr(self, "units_of_measure", units_of_measure)
         if wide:
-            data = to_wide_format(data, pivot_column=self.primary_dimension())
+            data = to_wide_format(data, pivot_column=primary_dimension)
+        if drop_control_cols:
+            # Select the columns to keep in a single pass
+            keep_cols = [
+                col
+                for col in data.columns
+                if col not in CONTROL_COLS or col == index_col
+            ]
+            data = data.reindex(columns=keep_cols)
         if index_col:
             data = data.set_index(index_col)
 
-        if drop_control_cols:
-            drop_cols = [col for col in CONTROL_COLS if col in data.columns]
-            data = data.drop(columns=drop_cols)
-
-        # Convert types
-        if 'REF_DATE' in data:
-            if not data['REF_DATE'].isnull().any():
-                data['REF_DATE'] = pd.to_datetime(data['REF_DATE'])
-
         data = data.rename(columns={'REF_DATE': 'Date', 'GEO':'Geo'})
         return data
 
-    def _set_metadata(self, metadata_file):
+    @functools.cached_property
+    def metadata(self):
+        data_file, metadata_file = self._fetch_data()
         meta_df: pd.DataFrame = pd.read_csv(metadata_file)
-        metadata: StatscanMetadata = StatscanMetadata(meta_df)
-        setattr(self, "metadata", metadata)
+        return StatscanMetadata(meta_df)
 
     def get_metadata(self):
-        if not hasattr(self, "metadata"):
-            data_file, metadata_file = self._fetch_data()
-            self._set_metadata(metadata_file)
         return self.metadata
 
     def get_data(
@@ -211,37 +408,57 @@ class StatscanZip(object):
         :param drop_control_cols: whether to drop the control columns
         :return: a Dataframe containing the data
         """
-        if not hasattr(self, "data"):
+        # Each combination of arguments gives a different frame
+        key = (wide, index_col, drop_control_cols)
+        if key not in self._data:
             data_file, metadata_file = self._fetch_data()
-            self._set_metadata(metadata_file)
-            data_raw = read_statscan_csv(data_file)
+            usecols = None
+            if drop_control_cols:
+                # Skip parsing the control columns, except UOM which is
+                # needed for the units of measure and the index column
+                header = pd.read_csv(data_file, nrows=0).columns
+                usecols = [
+                    col
+                    for col in header
+                    if col not in CONTROL_COLS or col in ["UOM", index_col]
+                ]
+            data_raw = read_statscan_csv(data_file, usecols=usecols)
             data = self.transform_statscan_data(
                 data_raw,
                 wide=wide,
                 index_col=index_col,
                 drop_control_cols=drop_control_cols,
             )
-            setattr(self, "data", data)
-        return self.data
+            self._data[key] = data
+        return self._data[key]
 
     def __repr__(self):
         return f"<{self.__class__.__name__}: {self.url}>"
 
 
+_METADATA_SECTIONS = {
+    "Note ID",
+    "Correction ID",
+    "Dimension ID",
+    "Symbol Legend",
+    "Survey Code",
+    "Subject Code",
+}
+
+
 class StatscanMetadata(object):
     def __init__(self, meta_df: pd.DataFrame):
         self.cube_info = meta_df.head(1).set_index("Cube Title").T
 
-        note_row = meta_df[meta_df["Cube Title"] == "Note ID"].index.item()
-        correction_row = meta_df[meta_df["Cube Title"] == "Correction ID"].index.item()
+        section_rows = self._find_section_rows(meta_df)
+        note_row = section_rows["Note ID"]
+        correction_row = section_rows["Correction ID"]
 
         self.note = meta_df.iloc[note_row + 1 : correction_row, 0:2]
         self.note.columns = ["Note ID", "Note"]
         self.note = self.note.set_index("Note ID")
 
-        dimension2_row = (
-            meta_df[meta_df["Cube Title"] == "Dimension ID"].tail(1).index.item()
-        )
+        dimension2_row = section_rows["Dimension ID"]
         self.dimensions = meta_df.iloc[2:dimension2_row, 0:4]
         self.dimensions.columns = [
             "Dimension ID",
@@ -255,7 +472,7 @@ class StatscanMetadata(object):
             self.note["Note"]
         )
 
-        symbol_row = meta_df[meta_df["Cube Title"] == "Symbol Legend"].index.item()
+        symbol_row = section_rows["Symbol Legend"]
         self.dimension_details = meta_df.iloc[dimension2_row + 1 : symbol_row, 0:8]
         self.dimension_details.columns = [
             "Dimension ID",
@@ -269,17 +486,28 @@ class StatscanMetadata(object):
         ]
         self.dimension_details = self.dimension_details.set_index("Dimension ID")
 
-        survey_row = meta_df[meta_df["Cube Title"] == "Survey Code"].index.item()
+        survey_row = section_rows["Survey Code"]
         self.survey = meta_df.iloc[survey_row + 1 : survey_row + 2, 0:2]
         self.survey.columns = ["Survey Code", "Survey Name"]
         self.survey = self.survey.set_index("Survey Code")
         self.name = self.survey["Survey Name"].item()
 
-        subject_row = meta_df[meta_df["Cube Title"] == "Subject Code"].index.item()
+        subject_row = section_rows["Subject Code"]
         self.subject = meta_df.iloc[subject_row + 1 : subject_row + 2, 0:2]
         self.subject.columns = ["Subject Code", "Subject Name"]
         self.subject = self.subject.set_index("Subject Code")
 
+    @staticmethod
+    def _find_section_rows(meta_df: pd.DataFrame):
+        """
+        Find the row each metadata section starts at in a single pass over the
+        first column. Dimension ID heads two sections so the last one is kept
+        """
+        titles = meta_df["Cube Title"]
+        # isin hashes the column in one vectorized pass
+        rows = np.flatnonzero(titles.isin(_METADATA_SECTIONS).to_numpy())
+        return {titles.iat[row]: int(row) for row in rows}
+
     def pivot_column(self):
         return self.dimensions.tail(1)["Dimension name"].item()
 
@@ -0,0 +1,124 @@
+import collections
+import functools
+import http.server
+import shutil
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+
+import pandas as pd
+
+STATSCAN_METADATA: str = """Cube Title,Product Id,CANSIM Id,URL,Cube Notes,Archive Status,Frequency,Start Reference Period,End Reference Period,Total number of dimensions
+Local test cube,99990001,,http://localhost,1,CURRENT,Monthly,2020-01-01,2020-02-01,2
+
+Dimension ID,Dimension name,Dimension Notes,Dimension Definitions
+1,Geography,,
+2,Element,1,
+
+Dimension ID,Member Name,Classification Code,Member ID,Parent Member ID,Terminated,Member Notes,Member Definitions
+1,Canada,,1,,,,
+1,Ontario,,2,1,,,
+2,Births,,1,,,,
+2,Deaths,,2,,,,
+
+Symbol Legend
+Symbol,Description
+..,not available
+
+Survey Code,Survey Name
+9999,Local test survey
+
+Subject Code,Subject Name
+9999,Local test subject
+
+Note ID,Note
+1,Element note
+
+Correction ID,Correction Date,Correction Note
+"""
+
+
+def statscan_data():
+    """
+    Long statscan data with every control column, Element being the pivot column
+    """
+    return pd.DataFrame(
+        {
+            "REF_DATE": ["2020-01", "2020-01", "2020-01", "2020-01", "2020-02", "2020-02"],
+            "GEO": ["Canada", "Canada", "Ontario", "Ontario", "Canada", "Canada"],
+            "DGUID": ["2016A000011124", "2016A000011124", "2016A000235", "2016A000235", "2016A000011124", "2016A000011124"],
+            "Element": ["Births", "Deaths", "Births", "Deaths", "Births", "Deaths"],
+            "UOM": ["Number"] * 6,
+            "UOM_ID": ["223"] * 6,
+            "SCALAR_FACTOR": ["units"] * 6,
+            "SCALAR_ID": ["0"] * 6,
+            "VECTOR": ["v1", "v2", "v3", "v4", "v1", "v2"],
+            "COORDINATE": ["1.1", "1.10", "2.1", "2.10", "1.1", "1.10"],
+            "VALUE": [10.0, 5.0, 4.0, None, 12.0, 6.0],
+            "STATUS": [None, None, None, "..", None, None],
+            "SYMBOL": [None] * 6,
+            "TERMINATED": [None] * 6,
+            "DECIMALS": ["0"] * 6,
+        }
+    )
+
+
+class _CountingHandler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, downloads=None, **kwargs):
+        self.downloads = downloads
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.downloads[self.path] += 1
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalZipServer:
+    """
+    Serves zip files from a temporary directory over http and counts the
+    downloads of each file
+    """
+
+    def __init__(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.downloads = collections.Counter()
+        handler = functools.partial(
+            _CountingHandler, downloads=self.downloads, directory=str(self.directory)
+        )
+        self.httpd = http.server.ThreadingHTTPServer(("localhost", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, filename: str):
+        return f"http://localhost:{self.httpd.server_port}/{filename}"
+
+    def add_zip(self, filename: str, files: dict):
+        with zipfile.ZipFile(self.directory / filename, "w") as zip_file:
+            for name, content in files.items():
+                zip_file.writestr(name, content)
+        return self.url(filename)
+
+    def add_statscan_zip(
+        self, resource_id: str, data: pd.DataFrame = None, language: str = "eng"
+    ):
+        if data is None:
+            data = statscan_data()
+        return self.add_zip(
+            f"{resource_id}-{language}.zip",
+            {
+                f"{resource_id}.csv": data.to_csv(index=False),
+                f"{resource_id}_MetaData.csv": STATSCAN_METADATA,
+            },
+        )
+
+    def download_count(self, url: str):
+        return self.downloads["/" + url.rsplit("/", 1)[-1]]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        shutil.rmtree(self.directory, ignore_errors=True)
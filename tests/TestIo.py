@@ -1,7 +1,10 @@
 import unittest
-from ocandata.datatools import get_filename_from_url, download_file, unzip_data
+from ocandata.datatools import get_filename_from_url, download_file, unzip_data, hash
 import os
+import shutil
+import tempfile
 from environs import Env
+from LocalZips import LocalZipServer
 
 class IOTests(unittest.TestCase):
 
@@ -43,5 +46,68 @@ class IOTests(unittest.TestCase):
         env.read_env()
         env('LALA', 'a')
 
+
+class UnzipCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalZipServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def add_zip(self, filename):
+        return self.server.add_zip(filename, {filename + '.csv': 'a,b\n1,2\n'})
+
+    def test_second_unzip_is_not_downloaded(self):
+        url = self.add_zip('cached.zip')
+        files = unzip_data(url, path=self.path)
+        self.assertEqual(files, unzip_data(url, path=self.path))
+        self.assertEqual(1, self.server.download_count(url))
+
+    def test_different_url_is_downloaded(self):
+        url = self.add_zip('first.zip')
+        other_url = self.add_zip('second.zip')
+        unzip_data(url, path=self.path)
+        files = unzip_data(other_url, path=self.path)
+        self.assertEqual((os.path.join(self.path, hash(other_url), 'second.zip.csv'),), files)
+        self.assertEqual(1, self.server.download_count(other_url))
+
+    def test_zips_with_the_same_members_are_kept_apart(self):
+        eng_url = self.server.add_zip('shared-eng.zip', {'shared.csv': 'a\n1\n'})
+        fra_url = self.server.add_zip('shared-fra.zip', {'shared.csv': 'a\n2\n'})
+        eng_files = unzip_data(eng_url, path=self.path)
+        fra_files = unzip_data(fra_url, path=self.path)
+        self.assertEqual(eng_files, unzip_data(eng_url, path=self.path))
+        with open(eng_files[0]) as fd:
+            self.assertEqual('a\n1\n', fd.read())
+        with open(fra_files[0]) as fd:
+            self.assertEqual('a\n2\n', fd.read())
+        self.assertEqual(1, self.server.download_count(eng_url))
+        self.assertEqual(1, self.server.download_count(fra_url))
+
+    def test_refresh_downloads_again(self):
+        url = self.add_zip('refreshed.zip')
+        unzip_data(url, path=self.path)
+        unzip_data(url, path=self.path, refresh=True)
+        self.assertEqual(2, self.server.download_count(url))
+
+    def test_partial_sentinel_is_ignored(self):
+        url = self.add_zip('partial.zip')
+        files = unzip_data(url, path=self.path)
+        sentinel = os.path.join(self.path, hash(url), '.extracted')
+        for count, content in enumerate(['', 'not a hash', '0123'], start=2):
+            with self.subTest(sentinel=content):
+                with open(sentinel, 'w') as fd:
+                    fd.write(content)
+                self.assertEqual(files, unzip_data(url, path=self.path))
+                self.assertEqual(count, self.server.download_count(url))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from LocalZips import statscan_data
+from ocandata import statscan
+from ocandata.statscan import read_statscan_csv
+
+
+def _read_statscan_csv_without_arrow(statcan_fn, usecols=None):
+    with mock.patch.object(statscan, "pa", None):
+        return read_statscan_csv(statcan_fn, usecols=usecols)
+
+
+class StatscanCsvTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.statcan_fn = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        # Dimension columns that aren't in STATSCAN_TYPES are left to type inference
+        statscan_data().assign(
+            **{
+                "Reference period": ["2020-01-01"] * 4 + ["2020-02-01"] * 2,
+                "Release time": ["08:30:00"] * 6,
+                "Age": [15, 15, 20, 20, 15, 15],
+            }
+        ).to_csv(self.statcan_fn, index=False)
+
+    def tearDown(self):
+        os.remove(self.statcan_fn)
+
+    def test_codes_are_read_as_strings(self):
+        data = read_statscan_csv(self.statcan_fn)
+        self.assertEqual(["1.1", "1.10", "2.1", "2.10", "1.1", "1.10"], data.COORDINATE.tolist())
+        self.assertEqual(["223"], data.UOM_ID.cat.categories.tolist())
+        self.assertEqual(["0"], data.SCALAR_ID.cat.categories.tolist())
+
+    def test_engines_read_the_same_frame(self):
+        if statscan.pa is None:
+            self.skipTest("pyarrow is not installed")
+        file_order = ["REF_DATE", "GEO", "Element", "UOM", "VALUE"]
+        other_order = ["VALUE", "Reference period", "Age", "GEO", "REF_DATE"]
+        for columns in [None, file_order, other_order]:
+            with self.subTest(usecols=columns):
+                pd.testing.assert_frame_equal(
+                    _read_statscan_csv_without_arrow(self.statcan_fn, usecols=columns),
+                    read_statscan_csv(self.statcan_fn, usecols=columns),
+                )
+
+    def test_usecols_keep_file_order(self):
+        data = read_statscan_csv(self.statcan_fn, usecols=["VALUE", "GEO", "REF_DATE"])
+        self.assertEqual(["REF_DATE", "GEO", "VALUE"], data.columns.tolist())
+
+    def test_dates_in_dimension_columns_are_strings(self):
+        data = read_statscan_csv(self.statcan_fn)
+        self.assertEqual("2020-01-01", data["Reference period"].iloc[0])
+        self.assertEqual("08:30:00", data["Release time"].iloc[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,14 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
+import pandas as pd
+
+from LocalZips import LocalZipServer, statscan_data
+from ocandata.datatools import hash
+from ocandata.repo import Repo
 from ocandata.statscan import StatscanZip, StatscanUrl
 
 RAIL_DATA_URL: str = "https://www150.statcan.gc.ca/n1/tbl/csv/23100274-eng.zip"
@@ -61,5 +70,112 @@ class StatscanZipTests(unittest.TestCase):
         self.assertGreater(len(data), 10)
 
 
+class LocalStatscanZipTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalZipServer()
+        cls.url = cls.server.add_statscan_zip("99990001")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.repo_dir = tempfile.mkdtemp()
+        self.repo = Repo.at(self.repo_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_dir, ignore_errors=True)
+
+    def test_wide_data_keeps_control_columns(self):
+        zip = StatscanZip(self.url, repo=self.repo)
+        data = zip.get_data(drop_control_cols=False)
+        self.assertEqual(["Births", "Deaths"], data.columns[-2:].tolist())
+        self.assertIn("VECTOR", data.columns)
+        self.assertIn("DGUID", data.columns)
+        self.assertEqual(3, len(data))
+
+    def test_wide_data_indexed_by_control_column(self):
+        zip = StatscanZip(self.url, repo=self.repo)
+        data = zip.get_data(index_col="VECTOR")
+        self.assertEqual("VECTOR", data.index.name)
+        self.assertEqual(["v1", "v3", "v1"], data.index.tolist())
+        self.assertNotIn("DGUID", data.columns)
+        self.assertEqual(12.0, data["Births"].iloc[2])
+
+    def test_get_data_is_cached_per_arguments(self):
+        zip = StatscanZip(self.url, repo=self.repo)
+        wide = zip.get_data()
+        long = zip.get_data(wide=False)
+        self.assertEqual((3, 4), wide.shape)
+        self.assertEqual((6, 4), long.shape)
+        self.assertIs(wide, zip.get_data())
+        self.assertIs(long, zip.get_data(wide=False))
+
+    def test_files_are_fetched_once(self):
+        zip = StatscanZip(self.url, repo=self.repo)
+        with mock.patch.object(self.repo, "unzip", wraps=self.repo.unzip) as unzip:
+            zip.get_data()
+            zip.get_data(wide=False)
+            zip.get_metadata()
+        unzip.assert_called_once()
+
+    def test_fetch_many(self):
+        first_url = self.server.add_statscan_zip("99990002")
+        second_url = self.server.add_statscan_zip(
+            "99990003", statscan_data().assign(VALUE=range(6))
+        )
+        urls = [first_url, second_url, first_url]
+        frames = StatscanZip.fetch_many(urls, repo=self.repo, wide=False)
+        self.assertEqual(3, len(frames))
+        self.assertEqual(12.0, frames[0].VALUE.max())
+        self.assertEqual(5, frames[1].VALUE.max())
+        pd.testing.assert_frame_equal(frames[0], frames[2])
+        self.assertEqual(1, self.server.download_count(first_url))
+        self.assertEqual(1, self.server.download_count(second_url))
+
+    def test_fetch_many_english_and_french(self):
+        eng_url = self.server.add_statscan_zip("99990007")
+        fra_url = self.server.add_statscan_zip(
+            "99990007", statscan_data().assign(VALUE=999.0), language="fra"
+        )
+        eng, fra = StatscanZip.fetch_many([eng_url, fra_url], repo=self.repo, wide=False)
+        self.assertEqual(12.0, eng.VALUE.max())
+        self.assertEqual(999.0, fra.VALUE.max())
+        self.assertEqual(1, self.server.download_count(eng_url))
+        self.assertEqual(1, self.server.download_count(fra_url))
+
+    def test_english_and_french_zips_are_kept_apart(self):
+        eng_url = self.server.add_statscan_zip("99990004")
+        fra_url = self.server.add_statscan_zip(
+            "99990004", statscan_data().assign(VALUE=999.0), language="fra"
+        )
+        for url, max_value in [(eng_url, 12.0), (fra_url, 999.0), (eng_url, 12.0)]:
+            data = StatscanZip(url, repo=self.repo).get_data(wide=False)
+            self.assertEqual(max_value, data.VALUE.max())
+        self.assertEqual(1, self.server.download_count(eng_url))
+        self.assertEqual(1, self.server.download_count(fra_url))
+
+    def test_cached_files_belong_to_the_url(self):
+        eng_url = self.server.add_statscan_zip("99990005")
+        fra_url = self.server.add_statscan_zip(
+            "99990005", statscan_data().assign(VALUE=999.0), language="fra"
+        )
+        zip = StatscanZip(eng_url, repo=self.repo)
+        zip.get_data()
+        StatscanZip(fra_url, repo=self.repo).get_data()
+        self.assertEqual(12.0, zip.get_data(wide=False).VALUE.max())
+        for file in zip._fetch_data():
+            self.assertEqual(hash(eng_url), os.path.basename(os.path.dirname(file)))
+
+    def test_removed_files_are_fetched_again(self):
+        url = self.server.add_statscan_zip("99990006")
+        zip = StatscanZip(url, repo=self.repo)
+        data_file, metadata_file = zip._fetch_data()
+        os.remove(data_file)
+        self.assertEqual((6, 4), zip.get_data(wide=False).shape)
+        self.assertEqual(2, self.server.download_count(url))
+
+
 if __name__ == "__main__":
     unittest.main()
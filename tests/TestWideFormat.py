@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ocandata import statscan
+from ocandata.statscan import to_wide_format
+
+
+def _long_data():
+    return pd.DataFrame(
+        {
+            "REF_DATE": ["2020-01", "2020-01", "2020-01", "2020-01", "2020-02", "2020-02"],
+            "GEO": pd.Categorical(["Canada", "Canada", "Ontario", "Ontario", "Canada", "Canada"]),
+            "Element": ["Births", "Deaths", "Births", "Deaths", "Births", "Deaths"],
+            "UOM": pd.Categorical(["Number"] * 6),
+            "VECTOR": ["v1", "v2", "v3", "v4", "v1", "v2"],
+            "VALUE": [10.0, 5.0, 4.0, np.nan, 12.0, 6.0],
+        }
+    )
+
+
+def _unsorted_data():
+    """
+    Long data where neither the groups nor the pivot values appear in sorted order
+    """
+    return pd.DataFrame(
+        {
+            "REF_DATE": ["2020-02", "2020-02", "2020-01", "2020-01", "2020-01", "2020-01", "2020-02"],
+            "GEO": pd.Categorical(["Quebec", "Quebec", "Ontario", "Quebec", "Ontario", "Quebec", "Quebec"]),
+            "Element": ["c", "a", "c", "b", "a", "a", "b"],
+            "VALUE": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        }
+    )
+
+
+def _to_wide_format_without_arrow(data, pivot_column):
+    with mock.patch.object(statscan, "pa", None):
+        return to_wide_format(data, pivot_column=pivot_column)
+
+
+class WideFormatTests(unittest.TestCase):
+    def test_pivot_column_becomes_columns(self):
+        wide = to_wide_format(_long_data(), pivot_column="Element")
+        self.assertEqual(
+            ["REF_DATE", "GEO", "UOM", "VECTOR", "Births", "Deaths"], wide.columns.tolist()
+        )
+        self.assertEqual(3, len(wide))
+
+    def test_values_are_aligned_with_groups(self):
+        wide = to_wide_format(_long_data(), pivot_column="Element")
+        wide = wide.set_index(["REF_DATE", "GEO"])
+        self.assertEqual(12.0, wide.loc[("2020-02", "Canada"), "Births"])
+        self.assertEqual(6.0, wide.loc[("2020-02", "Canada"), "Deaths"])
+        self.assertTrue(np.isnan(wide.loc[("2020-01", "Ontario"), "Deaths"]))
+
+    def test_rows_in_file_order_and_columns_sorted(self):
+        data = _unsorted_data()
+        expected = pd.DataFrame(
+            {
+                "REF_DATE": ["2020-02", "2020-01", "2020-01"],
+                "GEO": pd.Categorical(["Quebec", "Ontario", "Quebec"]),
+                "a": [2.0, 5.0, 6.0],
+                "b": [7.0, np.nan, 4.0],
+                "c": [1.0, 3.0, np.nan],
+            }
+        )
+        for pivot in [to_wide_format, _to_wide_format_without_arrow]:
+            with self.subTest(pivot=pivot.__name__):
+                pd.testing.assert_frame_equal(expected, pivot(data, "Element"))
+
+    def test_arrow_and_groupby_paths_agree(self):
+        rng = np.random.default_rng(0)
+        shuffled = pd.concat([_long_data()] * 50, ignore_index=True)
+        shuffled["REF_DATE"] = [f"2020-{month:02d}" for month in rng.integers(1, 13, len(shuffled))]
+        shuffled["VALUE"] = rng.random(len(shuffled))
+        shuffled.loc[rng.random(len(shuffled)) < 0.2, "VALUE"] = np.nan
+        shuffled = shuffled.drop_duplicates(["REF_DATE", "GEO", "Element"])
+        shuffled = shuffled.sample(frac=1, random_state=0)
+        categorical_pivot = _unsorted_data().astype({"Element": "category"})
+        inputs = {
+            "control columns": (_long_data(), True),
+            "unsorted": (_unsorted_data(), True),
+            "shuffled": (shuffled, True),
+            "categorical pivot": (categorical_pivot, True),
+            "duplicates": (pd.concat([_long_data(), _long_data().assign(VALUE=11.0)]), False),
+            "mixed object column": (_long_data().assign(GEO=[1, "A", 1, "A", 2, 2]), False),
+        }
+        for name, (data, arrow_pivots) in inputs.items():
+            with self.subTest(input=name):
+                if statscan.pa is not None and hasattr(statscan.pc, "PivotWiderOptions"):
+                    group_cols = [col for col in ["REF_DATE", "GEO"] if col in data]
+                    pivot_values = pd.Index(data["Element"].unique()).sort_values()
+                    pivoted = statscan._pivot_wider(data, group_cols, "Element", pivot_values)
+                    self.assertEqual(arrow_pivots, pivoted is not None)
+                pd.testing.assert_frame_equal(
+                    _to_wide_format_without_arrow(data, "Element"),
+                    to_wide_format(data, pivot_column="Element"),
+                )
+
+    def test_values_are_row_major(self):
+        wide = to_wide_format(_long_data(), pivot_column="Element")
+        values = wide[["Births", "Deaths"]].to_numpy()
+        self.assertTrue(values.flags.c_contiguous)
+
+    def test_duplicate_values_take_the_max(self):
+        data = pd.concat([_long_data(), _long_data().assign(VALUE=11.0)])
+        wide = to_wide_format(data, pivot_column="Element")
+        wide = wide.set_index(["REF_DATE", "GEO"])
+        self.assertEqual(3, len(wide))
+        self.assertEqual(12.0, wide.loc[("2020-02", "Canada"), "Births"])
+        self.assertEqual(11.0, wide.loc[("2020-01", "Canada"), "Births"])
+
+    def test_unused_categories_are_not_expanded(self):
+        data = _long_data()
+        data["GEO"] = data["GEO"].cat.add_categories(["Quebec", "Yukon"])
+        wide = to_wide_format(data, pivot_column="Element")
+        self.assertEqual(3, len(wide))
+        self.assertNotIn("Quebec", wide["GEO"].tolist())
+
+    def test_does_not_modify_input(self):
+        data = _long_data()
+        to_wide_format(data, pivot_column="Element")
+        pd.testing.assert_frame_equal(_long_data(), data)
+
+
+if __name__ == "__main__":
+    unittest.main()